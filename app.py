@@ -4,6 +4,7 @@ Streamlit app to browse extracted contract metadata.
 
 Features:
 - Loads either a combined `dataset/filings.json` (normalized) or all `dataset/filings_<scope>.json` (pre-normalized)
+- Caches the flattened rows in `dataset/filings.parquet` and reloads from it while the JSON sources are unchanged
 - HTML files are stored under `dataset/files/`
 - Provides filters: contract type, is amendment
 - Displays filtered documents as a table with key metadata fields
@@ -13,15 +14,53 @@ from __future__ import annotations
 
 import json
 import os
-from typing import Any, Dict, List, Optional
+import shutil
+from typing import Any, Dict, List, Optional, Tuple
 
+import numpy as np
 import pandas as pd
 import altair as alt
+import pyarrow as pa
+import pyarrow.parquet as pq
 import streamlit as st
 import streamlit.components.v1 as components
 
+try:
+    import orjson
+except ImportError:  # optional speedup; stdlib json is used otherwise
+    orjson = None
+
+
+# Columnar copy of the flattened dataset, written next to the JSON sources
+DATASET_PARQUET = "filings.parquet"
+
+# Streamlit serves ./static next to this file when server.enableStaticServing is on;
+# viewer documents are linked into its files/ subfolder and loaded by URL
+STATIC_FILES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "files")
+STATIC_FILES_URL = "app/static/files"
+
+# Columns shown in the table
+DISPLAY_COLS = [
+    "uid",
+    "formType",
+    "contract_type",
+    "version_type",
+    "contract_date",
+    "is_amendment",
+    "amendment_date",
+    "amendment_number",
+    "party_1_name",
+    "party_2_name",
+    "confidence",
+    "doc_pages_estimate",
+    "html_path",
+]
+
 
 def read_json(path: str) -> Any:
+    if orjson is not None:
+        with open(path, "rb") as f:
+            return orjson.loads(f.read())
     with open(path, "r", encoding="utf-8") as f:
         return json.load(f)
 
@@ -62,14 +101,63 @@ def flatten_filing(scope: str, filing: Dict[str, Any], dataset_dir: str) -> Dict
         "party_2_name": party2.get("name"),
         "confidence": meta.get("confidence"),
         # stats and paths
-        "doc_pages_estimate": int(stats.get("doc_pages_estimate")),
+        "doc_pages_estimate": int(stats["doc_pages_estimate"]) if stats.get("doc_pages_estimate") is not None else None,
         "html_path": html_path,
     }
 
 
-@st.cache_data(show_spinner=False)
-def load_dataset_rows(dataset_dir: str) -> pd.DataFrame:
-    rows: List[Dict[str, Any]] = []
+def flatten_filings(scopes: List[str], filings: List[Dict[str, Any]], dataset_dir: str) -> pd.DataFrame:
+    """Column-wise `flatten_filing` over a whole list of filings.
+
+    Each output column is built in one pass over the records, and HTML paths are
+    resolved against a single listing of `files/` instead of two stat calls per row.
+    """
+    files_dir = os.path.join(dataset_dir, "files")
+    present = set(os.listdir(files_dir)) if os.path.isdir(files_dir) else set()
+    metas = [f.get("metadata") or {} for f in filings]
+    stats = [f.get("_doc_stats") or {} for f in filings]
+    uids = [f.get("uid") or "" for f in filings]
+    pages = [s.get("doc_pages_estimate") for s in stats]
+    html_paths = [
+        os.path.join(files_dir, f"{uid}.htm")
+        if f"{uid}.htm" in present
+        else (os.path.join(files_dir, f"{uid}.html") if f"{uid}.html" in present else None)
+        for uid in uids
+    ]
+    return pd.DataFrame(
+        {
+            "scope": scopes,
+            "uid": uids,
+            "formType": [f.get("formType") for f in filings],
+            # metadata
+            "contract_type": [m.get("contract_type") or "Unknown" for m in metas],
+            "version_type": [m.get("version_type") or None for m in metas],
+            "contract_date": [m.get("contract_date") or None for m in metas],
+            "is_amendment": [m.get("is_amendment") for m in metas],
+            "amendment_date": [m.get("amendment_date") or None for m in metas],
+            "amendment_number": [m.get("amendment_number") or None for m in metas],
+            "party_1_name": [(m.get("party_1") or {}).get("name") for m in metas],
+            "party_2_name": [(m.get("party_2") or {}).get("name") for m in metas],
+            "confidence": [m.get("confidence") for m in metas],
+            # stats and paths
+            "doc_pages_estimate": [int(p) if p is not None else None for p in pages],
+            "html_path": html_paths,
+        }
+    )
+
+
+def json_source_paths(dataset_dir: str) -> List[str]:
+    """Return the JSON files the dataset is built from (combined file first, else per-scope files)."""
+    combined_path = os.path.join(dataset_dir, "filings.json")
+    if os.path.exists(combined_path):
+        return [combined_path]
+    return [os.path.join(dataset_dir, f"filings_{scope}.json") for scope in list_scopes_flat(dataset_dir)]
+
+
+def load_json_rows(dataset_dir: str) -> pd.DataFrame:
+    """Build the flattened rows from the JSON dataset files (legacy path)."""
+    scopes: List[str] = []
+    filings_all: List[Dict[str, Any]] = []
     combined_path = os.path.join(dataset_dir, "filings.json")
     if os.path.exists(combined_path):
         try:
@@ -78,8 +166,8 @@ def load_dataset_rows(dataset_dir: str) -> pd.DataFrame:
             filings = []
         if isinstance(filings, list):
             for filing in filings:
-                scope = str(filing.get("scope") or "unknown")
-                rows.append(flatten_filing(scope, filing, dataset_dir))
+                scopes.append(str(filing.get("scope") or "unknown"))
+            filings_all.extend(filings)
     else:
         for scope in list_scopes_flat(dataset_dir):
             filings_path = os.path.join(dataset_dir, f"filings_{scope}.json")
@@ -88,11 +176,181 @@ def load_dataset_rows(dataset_dir: str) -> pd.DataFrame:
             except Exception:
                 filings = []
             if isinstance(filings, list):
-                for filing in filings:
-                    rows.append(flatten_filing(scope, filing, dataset_dir))
-    if not rows:
+                scopes.extend([scope] * len(filings))
+                filings_all.extend(filings)
+    if not filings_all:
         return pd.DataFrame()
-    return pd.DataFrame(rows)
+    return flatten_filings(scopes, filings_all, dataset_dir)
+
+
+# Parquet schema metadata key holding the `dataset_signature` the file was built from
+PARQUET_SIGNATURE_KEY = b"dataset_signature"
+
+
+def parquet_is_fresh(parquet_path: str, signature: Tuple[Tuple[str, int, int], ...]) -> bool:
+    """True if the Parquet file exists and was built from sources matching `signature`.
+
+    Comparing the stored signature (names, mtimes and sizes) rather than mtimes alone
+    also catches deleted sources, e.g. a removed scope file or a removed filings.json
+    that makes the per-scope files the source again.
+    """
+    if not os.path.exists(parquet_path):
+        return False
+    try:
+        metadata = pq.read_schema(parquet_path).metadata or {}
+        stored = json.loads(metadata[PARQUET_SIGNATURE_KEY])
+    except Exception:
+        return False
+    return stored == [list(entry) for entry in signature]
+
+
+def write_parquet_rows(df: pd.DataFrame, parquet_path: str, signature: Tuple[Tuple[str, int, int], ...]) -> None:
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    metadata = dict(table.schema.metadata or {})
+    metadata[PARQUET_SIGNATURE_KEY] = json.dumps([list(entry) for entry in signature]).encode("utf-8")
+    pq.write_table(table.replace_schema_metadata(metadata), parquet_path, compression="zstd")
+
+
+def read_parquet_rows(parquet_path: str) -> pd.DataFrame:
+    # All columns, so the frame is the same whether it comes from the cache or from JSON
+    return pq.read_table(parquet_path).to_pandas()
+
+
+def optimize_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """Store the low-cardinality filter columns as categorical / nullable boolean."""
+    if "contract_type" in df.columns:
+        df["contract_type"] = df["contract_type"].astype("category")
+    if "is_amendment" in df.columns:
+        df["is_amendment"] = df["is_amendment"].astype("boolean")
+    return df
+
+
+def dataset_signature(dataset_dir: str) -> Tuple[Tuple[str, int, int], ...]:
+    """(name, mtime_ns, size) of each JSON source and of `files/`, used as a cache key."""
+    paths = json_source_paths(dataset_dir) + [os.path.join(dataset_dir, "files")]
+    signature = []
+    for path in paths:
+        try:
+            stat_result = os.stat(path)
+        except OSError:
+            continue
+        signature.append((os.path.basename(path), stat_result.st_mtime_ns, stat_result.st_size))
+    return tuple(signature)
+
+
+# Disk persistence keeps the frame across server restarts; the signature argument
+# changes whenever a source file does, so stale entries are never served
+@st.cache_data(show_spinner=False, persist="disk", max_entries=1)
+def load_dataset_rows(dataset_dir: str, signature: Tuple[Tuple[str, int, int], ...] = ()) -> pd.DataFrame:
+    # Prefer the columnar copy; rebuild it from JSON whenever the sources changed
+    signature = signature or dataset_signature(dataset_dir)
+    parquet_path = os.path.join(dataset_dir, DATASET_PARQUET)
+    if parquet_is_fresh(parquet_path, signature):
+        try:
+            return optimize_dtypes(read_parquet_rows(parquet_path))
+        except Exception:
+            pass
+    df = load_json_rows(dataset_dir)
+    if not df.empty:
+        try:
+            write_parquet_rows(df, parquet_path, signature)
+        except Exception:
+            # Read-only dataset dir or non-uniform column types: keep the JSON result
+            pass
+    return optimize_dtypes(df)
+
+
+def filter_rows(df: pd.DataFrame, contract_types: List[str], is_amendment_choice: Any) -> pd.DataFrame:
+    """Apply the sidebar filters with one combined mask and a single take."""
+    mask = np.ones(len(df), dtype=bool)
+    if contract_types:
+        mask &= df["contract_type"].isin(contract_types).to_numpy()
+    if is_amendment_choice != "All":
+        mask &= (df["is_amendment"] == is_amendment_choice).to_numpy(dtype=bool, na_value=False)
+    if mask.all():
+        return df
+    return df.iloc[mask]
+
+
+def viewer_options(filtered: pd.DataFrame) -> List[Dict[str, str]]:
+    """Build the viewer's select options (one per uid) from whole columns at once."""
+    uids = filtered["uid"].astype(str)
+    first = ~uids.duplicated(keep="first").to_numpy()
+    contract_types = filtered["contract_type"].astype(object).fillna("Unknown").astype(str)
+    amendments = filtered["is_amendment"]
+    amendment_strs = np.where(
+        amendments.isna().to_numpy(),
+        "Unknown",
+        np.where(amendments.fillna(False).astype(bool).to_numpy(), "True", "False"),
+    )
+    return [
+        {"uid": uid, "label": f"{uid} / {contract_type} / {amendment}"}
+        for uid, contract_type, amendment in zip(
+            uids.to_numpy()[first].tolist(),
+            contract_types.to_numpy()[first].tolist(),
+            amendment_strs[first].tolist(),
+        )
+    ]
+
+
+# Keyed on the dataset signature and filter state only: the leading underscore tells
+# Streamlit not to hash the frame, so viewer widget changes reuse the options
+@st.cache_data(show_spinner=False, max_entries=32)
+def cached_viewer_options(
+    signature: Tuple[Tuple[str, int, int], ...],
+    contract_types: Tuple[str, ...],
+    is_amendment_choice: Any,
+    _filtered: pd.DataFrame,
+) -> List[Dict[str, str]]:
+    return viewer_options(_filtered)
+
+
+def chart_counts(filtered: pd.DataFrame) -> Tuple[pd.DataFrame, List[str]]:
+    """Document counts per (contract_type, is_amendment) and the x-axis order.
+
+    One crosstab yields both the stacked counts and the per-type totals used to
+    sort the axis (descending).
+    """
+    # Only consider rows where is_amendment is boolean for the stacked breakdown
+    mask = filtered["is_amendment"].isin([True, False]).to_numpy(dtype=bool)
+    contract_type = filtered["contract_type"][mask]
+    if isinstance(contract_type.dtype, pd.CategoricalDtype) and "Unknown" not in contract_type.cat.categories:
+        contract_type = contract_type.cat.add_categories("Unknown")
+    contract_type = contract_type.fillna("Unknown")
+    if contract_type.empty:
+        return pd.DataFrame(columns=["contract_type", "is_amendment", "count"]), []
+    ct = pd.crosstab(contract_type, filtered["is_amendment"][mask].astype(bool))
+    totals = ct.sum(axis=1)
+    # Categorical input lists unobserved categories too
+    totals = totals[totals > 0].sort_values(ascending=False, kind="stable")
+    grouped = ct.stack().rename("count").reset_index()
+    grouped = grouped[grouped["count"] > 0].reset_index(drop=True)
+    return grouped, totals.index.tolist()
+
+
+def publish_static_html(html_path: str, static_dir: str = STATIC_FILES_DIR) -> str:
+    """Expose `html_path` under Streamlit's static folder and return its file name.
+
+    Hard links are used where possible (Streamlit rejects symlinks pointing outside
+    the static root); otherwise the file is copied. An existing entry is reused while
+    its size and mtime still match the source.
+    """
+    name = os.path.basename(html_path)
+    target = os.path.join(static_dir, name)
+    src = os.stat(html_path)
+    try:
+        dst = os.stat(target)
+        if dst.st_size == src.st_size and dst.st_mtime_ns == src.st_mtime_ns:
+            return name
+        os.remove(target)
+    except FileNotFoundError:
+        pass
+    os.makedirs(static_dir, exist_ok=True)
+    try:
+        os.link(html_path, target)
+    except OSError:
+        shutil.copy2(html_path, target)
+    return name
 
 
 def main() -> None:
@@ -101,13 +359,14 @@ def main() -> None:
 
     dataset_dir = "dataset"
 
-    df = load_dataset_rows(dataset_dir)
+    signature = dataset_signature(dataset_dir)
+    df = load_dataset_rows(dataset_dir, signature)
     if df.empty:
         st.info("No dataset found. Provide either `dataset/filings.json` (normalized) or one/more `dataset/filings_<scope>.json` files. Ensure HTMLs are under `dataset/files/`.")
         return
 
     # Prepare filter choices
-    all_contract_types = sorted([x for x in df["contract_type"].dropna().unique().tolist()])
+    all_contract_types = df["contract_type"].cat.categories.tolist()
 
     with st.sidebar:
         st.header("Filters")
@@ -123,61 +382,29 @@ def main() -> None:
         )
 
     # Apply filters
-    filtered = df.copy()
-    if contract_type_selected:
-        filtered = filtered[filtered["contract_type"].isin(contract_type_selected)]
-    if is_amendment_choice != "All":
-        filtered = filtered[filtered["is_amendment"] == is_amendment_choice]
+    filtered = filter_rows(df, contract_type_selected, is_amendment_choice)
 
     st.caption(f"Showing {len(filtered)} of {len(df)} documents")
 
     tab_table, tab_chart, tab_viewer = st.tabs(["Table", "Bar chart (stacked)", "Viewer"]) 
 
     with tab_table:
-        display_cols = [
-            "uid",
-            "formType",
-            "contract_type",
-            "version_type",
-            "contract_date",
-            "is_amendment",
-            "amendment_date",
-            "amendment_number",
-            "party_1_name",
-            "party_2_name",
-            "confidence",
-            "doc_pages_estimate",
-            "html_path",
-        ]
-        display_cols = [c for c in display_cols if c in filtered.columns]
+        display_cols = [c for c in DISPLAY_COLS if c in filtered.columns]
         st.dataframe(filtered[display_cols], use_container_width=True)
 
-        csv_bytes = filtered[display_cols].to_csv(index=False).encode("utf-8")
+        # Built only when the button is clicked, not on every rerun
         st.download_button(
             label="Download CSV",
-            data=csv_bytes,
+            data=lambda: filtered[display_cols].to_csv(index=False).encode("utf-8"),
             file_name="filtered_filings.csv",
             mime="text/csv",
         )
 
     with tab_chart:
-        # Only consider rows where is_amendment is boolean for the stacked breakdown
-        chart_df = filtered.copy()
-        chart_df = chart_df[chart_df["is_amendment"].isin([True, False])]
-        # Ensure contract_type exists
-        chart_df["contract_type"] = chart_df["contract_type"].fillna("Unknown")
-        # Aggregate counts
-        grouped = (
-            chart_df.groupby(["contract_type", "is_amendment"]).size().reset_index(name="count")
-        )
+        grouped, contract_order = chart_counts(filtered)
         if grouped.empty:
             st.info("No data available for chart (check filters).")
         else:
-            # Sort x-axis by total count descending
-            totals = grouped.groupby("contract_type")["count"].sum().reset_index()
-            totals = totals.sort_values("count", ascending=False)
-            contract_order = totals["contract_type"].tolist()
-
             chart = (
                 alt.Chart(grouped)
                 .mark_bar()
@@ -209,21 +436,10 @@ def main() -> None:
                 viewer_height = st.number_input(
                     "Viewer height (px)", min_value=400, max_value=2000, value=1000, step=50
                 )
-            # Build labeled options: "uid / contract_type / is_amendment"
-            opts_df = filtered.copy()
-            opts_df["uid"] = opts_df["uid"].astype(str)
-            opts_df["contract_type"] = opts_df["contract_type"].fillna("Unknown").astype(str)
-            def _amend_str(v):
-                return "True" if v is True else ("False" if v is False else "Unknown")
-            opts_df["is_amendment_str"] = opts_df["is_amendment"].apply(_amend_str)
-            opts_df = opts_df.drop_duplicates(subset=["uid"], keep="first")
-            options = [
-                {
-                    "uid": r["uid"],
-                    "label": f"{r['uid']} / {r['contract_type']} / {r['is_amendment_str']}",
-                }
-                for _, r in opts_df[["uid", "contract_type", "is_amendment_str"]].iterrows()
-            ]
+            # Labeled options: "uid / contract_type / is_amendment"
+            options = cached_viewer_options(
+                signature, tuple(contract_type_selected), is_amendment_choice, filtered
+            )
             if not options:
                 st.info("No documents to select.")
                 return
@@ -261,9 +477,20 @@ def main() -> None:
                         st.warning("HTML file not found for this UID.")
                     else:
                         try:
-                            with open(html_path, "r", encoding="utf-8", errors="ignore") as f:
-                                html_content = f.read()
-                            components.html(html_content, width=int(viewer_width), height=int(viewer_height), scrolling=True)
+                            if st.get_option("server.enableStaticServing"):
+                                # Let the browser fetch (and cache) the document instead of
+                                # pushing it through the websocket on every selection
+                                name = publish_static_html(html_path)
+                                components.iframe(
+                                    f"{STATIC_FILES_URL}/{name}",
+                                    width=int(viewer_width),
+                                    height=int(viewer_height),
+                                    scrolling=True,
+                                )
+                            else:
+                                with open(html_path, "r", encoding="utf-8", errors="ignore") as f:
+                                    html_content = f.read()
+                                components.html(html_content, width=int(viewer_width), height=int(viewer_height), scrolling=True)
                         except Exception as e:
                             st.error(f"Failed to render HTML: {e}")
 
@@ -28,21 +28,29 @@ Requirements:
 from __future__ import annotations
 
 import argparse
+import hashlib
+import itertools
 import json
 import logging
 import os
-import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dataclasses import asdict
 from typing import Any, Dict, List, Optional
 
-from bs4 import BeautifulSoup
+from lxml import etree
+
+try:
+    import orjson
+except ImportError:  # optional speedup; stdlib json is used otherwise
+    orjson = None
 
 # LangChain / OpenAI
 try:
-    # Core Prompting / Pydantic v1 shim
+    # Core Prompting
     from langchain_core.prompts import ChatPromptTemplate
-    from langchain_core.pydantic_v1 import BaseModel, Field
     from langchain_openai import ChatOpenAI
+    from pydantic import BaseModel, Field
 except Exception as exc:  # pragma: no cover - helpful runtime hint
     raise RuntimeError(
         "LangChain and langchain-openai are required. Install with: pip install langchain langchain-openai"
@@ -69,37 +77,120 @@ def configure_logging(level: str) -> None:
 
 
 def read_json_file(path: str) -> Any:
+    if orjson is not None:
+        with open(path, "rb") as f:
+            return orjson.loads(f.read())
     with open(path, "r", encoding="utf-8") as f:
         return json.load(f)
 
 
 def write_json_file(path: str, data: Any) -> None:
+    if orjson is not None:
+        with open(path, "wb") as f:
+            f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+        return
     with open(path, "w", encoding="utf-8") as f:
         json.dump(data, f, indent=2, ensure_ascii=False)
 
 
+def dumps_json_line(data: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(data) + b"\n"
+    return (json.dumps(data, ensure_ascii=False) + "\n").encode("utf-8")
+
+
 def normalize_whitespace(text: str) -> str:
-    text = re.sub(r"\s+", " ", text)
-    return text.strip()
+    # str.split() drops runs of whitespace in C, same result as re.sub(r"\s+", " ").strip()
+    return " ".join(text.split())
+
+
+# Elements whose text is not visible in a rendered page
+HIDDEN_TAGS = frozenset(("script", "style", "noscript"))
+
+# Size of the slices fed to the parser; lets extraction stop once enough words are seen
+HTML_FEED_BYTES = 1 << 16
+
+
+class VisibleTextTarget:
+    """lxml parser target collecting the visible text nodes of an HTML document.
+
+    Text inside script/style/noscript and comments is skipped. lxml delivers a text
+    node in several pieces (e.g. around entities); the pieces are joined back so each
+    node stays one string. Unlike a parsed tree, a target keeps receiving events after
+    a premature `</html>`, so trailing content and concatenated documents are kept.
+    """
+
+    def __init__(self) -> None:
+        self.texts: List[str] = []
+        self.word_count = 0
+        self._pending: List[str] = []
+        self._hidden = 0
+
+    def _flush(self) -> None:
+        if self._pending:
+            text = "".join(self._pending)
+            self._pending = []
+            self.texts.append(text)
+            self.word_count += len(text.split())
+
+    def start(self, tag: str, attrib: Dict[str, str]) -> None:
+        self._flush()
+        if tag in HIDDEN_TAGS:
+            self._hidden += 1
+
+    def end(self, tag: str) -> None:
+        self._flush()
+        if tag in HIDDEN_TAGS and self._hidden:
+            self._hidden -= 1
+
+    def data(self, data: str) -> None:
+        if not self._hidden:
+            self._pending.append(data)
+
+    def comment(self, text: str) -> None:
+        self._flush()
+
+    def pi(self, target: str, data: Optional[str] = None) -> None:
+        self._flush()
+
+    def doctype(self, name: str, pubid: Optional[str], system: Optional[str]) -> None:
+        self._flush()
+
+    def close(self) -> List[str]:
+        self._flush()
+        return self.texts
+
+
+def visible_text_words(html: str, max_words: Optional[int] = None) -> List[str]:
+    """Return the words of the visible text of `html`.
+
+    With `max_words`, parsing stops once at least that many words were collected
+    (more may be returned).
+    """
+    if not html or not html.strip():
+        return []
+    target = VisibleTextTarget()
+    parser = etree.HTMLParser(target=target, encoding="utf-8")
+    data = html.encode("utf-8", errors="ignore")
+    try:
+        for offset in range(0, len(data), HTML_FEED_BYTES):
+            parser.feed(data[offset : offset + HTML_FEED_BYTES])
+            if max_words is not None and target.word_count >= max_words:
+                break
+        texts = parser.close()
+    except etree.LxmlError:
+        return []
+    return " ".join(texts).split()
 
 
 def html_to_text_first_words(html: str, max_words: int) -> str:
     """Convert HTML to text and return the first ~max_words words.
 
     - Removes script/style
-    - Extracts visible text
+    - Extracts visible text, stopping once max_words words are collected
     - Collapses whitespace
     """
-    soup = BeautifulSoup(html, "lxml")
-    for tag in soup(["script", "style", "noscript"]):
-        tag.decompose()
-    text = soup.get_text(separator=" ")
-    text = normalize_whitespace(text)
-    if not text:
-        return ""
-    words = text.split(" ")
-    snippet = " ".join(words[:max_words])
-    return snippet
+    return " ".join(visible_text_words(html, max_words=max_words)[:max_words])
 
 
 def html_text_stats(html: str, max_words: int) -> tuple[str, int]:
@@ -108,27 +199,42 @@ def html_text_stats(html: str, max_words: int) -> tuple[str, int]:
     - snippet: first ~max_words words
     - total_word_count: full text word count for page estimation
     """
-    soup = BeautifulSoup(html, "lxml")
-    for tag in soup(["script", "style", "noscript"]):
-        tag.decompose()
-    text = soup.get_text(separator=" ")
-    text = normalize_whitespace(text)
-    if not text:
+    words = visible_text_words(html)
+    if not words:
         return "", 0
-    words = text.split(" ")
     snippet = " ".join(words[:max_words])
     return snippet, len(words)
 
 
-def read_snippet_and_word_count(html_path: str, max_words: int) -> tuple[Optional[str], Optional[int]]:
+def read_snippet_and_word_count(
+    html_path: str, max_words: int, head_bytes: Optional[int] = None
+) -> tuple[Optional[str], Optional[int], bool]:
+    """Return (snippet, total_word_count, word_count_estimated) for an HTML file.
+
+    With `head_bytes`, only that prefix of a larger file is parsed as long as it holds
+    more than max_words words; the total count is then extrapolated from the prefix's
+    word density and flagged as estimated. Otherwise (or when the prefix is too sparse)
+    the whole file is parsed and the count is exact.
+    """
+    estimated = False
     try:
-        with open(html_path, "r", encoding="utf-8", errors="ignore") as f:
-            html = f.read()
+        size = os.path.getsize(html_path)
+        with open(html_path, "rb") as f:
+            data = f.read(head_bytes) if head_bytes and size > head_bytes else f.read()
+            snippet, total_words = html_text_stats(data.decode("utf-8", errors="ignore"), max_words=max_words)
+            if len(data) < size:
+                if total_words > max_words:
+                    total_words = int(total_words * size / len(data))
+                    estimated = True
+                else:
+                    data += f.read()
+                    snippet, total_words = html_text_stats(
+                        data.decode("utf-8", errors="ignore"), max_words=max_words
+                    )
     except Exception as exc:
         logging.warning("Failed to read %s: %s", html_path, exc)
-        return None, None
-    snippet, total_words = html_text_stats(html, max_words=max_words)
-    return snippet, total_words
+        return None, None, False
+    return snippet, total_words, estimated
 
 
 def ensure_exists(path: str) -> bool:
@@ -177,55 +283,151 @@ class ContractMetadata(BaseModel):
     )
 
 
+SYSTEM_PROMPT = (
+    "You are a senior legal documentation analyst. "
+    "Extract the requested metadata from the first ~page of a filing exhibit. "
+    "Output must follow the provided schema and be grounded strictly in the text. "
+    "If unknown, return null/None. Dates should be in YYYY-MM-DD when possible. "
+    "Only infer when strongly supported; otherwise prefer null and lower confidence."
+)
+
+HUMAN_PROMPT = (
+    "Allowed values:\n"
+    "- document_type: contract | confirmation | other. NB: a contract should be an actual contract, not a letter or a memo referring to a contract.\n"
+    "- contract_category: master | collateral | facility | other\n\n"
+    "Document first-page snippet (truncated):\n"  # Not fenced to avoid token overhead
+    "{snippet}\n\n"
+    "Now extract the metadata."
+)
+
+
 def build_chain(model_name: str, temperature: float) -> Any:
     llm = ChatOpenAI(model=model_name, temperature=temperature)
-    # Use LCEL with structured output
-    structured_llm = llm.with_structured_output(ContractMetadata)
-    system = (
-        "You are a senior legal documentation analyst. "
-        "Extract the requested metadata from the first ~page of a filing exhibit. "
-        "Output must follow the provided schema and be grounded strictly in the text. "
-        "If unknown, return null/None. Dates should be in YYYY-MM-DD when possible. "
-        "Only infer when strongly supported; otherwise prefer null and lower confidence."
-    )
-    prompt = ChatPromptTemplate.from_messages(
-        [
-            ("system", system),
-            (
-                "human",
-                (
-                    "Allowed values:\n"
-                    "- document_type: contract | confirmation | other. NB: a contract should be an actual contract, not a letter or a memo referring to a contract.\n"
-                    "- contract_category: master | collateral | facility | other\n\n"
-                    "Document first-page snippet (truncated):\n"  # Not fenced to avoid token overhead
-                    "{snippet}\n\n"
-                    "Now extract the metadata."
-                ),
-            ),
-        ]
-    )
+    # Use LCEL with structured output; json_schema lets OpenAI enforce the schema server-side
+    structured_llm = llm.with_structured_output(ContractMetadata, method="json_schema")
+    prompt = ChatPromptTemplate.from_messages([("system", SYSTEM_PROMPT), ("human", HUMAN_PROMPT)])
     return prompt | structured_llm
 
 
+def chain_cache_key(model_name: str, temperature: float) -> str:
+    """Hash of everything besides the snippet that shapes an LLM answer.
+
+    Covers the model, temperature, prompt messages and output schema, so changing any
+    of them (e.g. editing the prompt or ContractMetadata) stops reusing cached results.
+    """
+    payload = {
+        "model": model_name,
+        "temperature": temperature,
+        "messages": [["system", SYSTEM_PROMPT], ["human", HUMAN_PROMPT]],
+        "schema": ContractMetadata.model_json_schema(),
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def llm_cache_path(cache_dir: str, chain_key: str, snippet: str) -> str:
+    """Cache file for an LLM result, keyed on the chain (see `chain_cache_key`) and the exact snippet."""
+    key = hashlib.sha256(f"{chain_key}\n{snippet}".encode("utf-8")).hexdigest()
+    return os.path.join(cache_dir, f"{key}.json")
+
+
+def load_cached_metadata(cache_path: str) -> Optional[ContractMetadata]:
+    if not ensure_exists(cache_path):
+        return None
+    try:
+        return ContractMetadata.model_validate(read_json_file(cache_path))
+    except Exception as exc:
+        logging.warning("Ignoring unreadable LLM cache entry %s: %s", cache_path, exc)
+        return None
+
+
+def save_cached_metadata(cache_path: str, meta: ContractMetadata) -> None:
+    # Write then rename so concurrent workers and crashes never leave partial entries
+    tmp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    write_json_file(tmp_path, meta.model_dump(mode="json"))
+    os.replace(tmp_path, cache_path)
+
+
 def extract_metadata_html(
-    chain: Any, html_path: str, max_words: int
-) -> tuple[Optional[ContractMetadata], Optional[int]]:
-    snippet, total_words = read_snippet_and_word_count(html_path, max_words=max_words)
+    chain: Any,
+    html_path: str,
+    max_words: int,
+    head_bytes: Optional[int] = None,
+    cache_dir: Optional[str] = None,
+    chain_key: str = "",
+) -> tuple[Optional[ContractMetadata], Optional[int], bool]:
+    """Return (metadata, total_word_count, word_count_estimated) for an HTML file."""
+    snippet, total_words, estimated = read_snippet_and_word_count(
+        html_path, max_words=max_words, head_bytes=head_bytes
+    )
     if snippet is None or total_words is None:
-        return None, None
+        return None, None, False
     if total_words < 500:
         # Less than ~1 page: skip LLM per requirement
         logging.info("Skipping LLM for short doc (%s words) at %s", total_words, html_path)
-        return None, total_words
+        return None, total_words, estimated
     if not snippet or len(snippet) < 50:
         logging.info("Insufficient text after HTML extraction for %s", html_path)
-        return None, total_words
+        return None, total_words, estimated
+    cache_path = llm_cache_path(cache_dir, chain_key, snippet) if cache_dir else None
+    if cache_path:
+        cached = load_cached_metadata(cache_path)
+        if cached is not None:
+            logging.debug("LLM cache hit for %s", html_path)
+            return cached, total_words, estimated
     try:
         result: ContractMetadata = chain.invoke({"snippet": snippet})
-        return result, total_words
     except Exception as exc:
         logging.warning("LLM extraction failed for %s: %s", html_path, exc)
-        return None, total_words
+        return None, total_words, estimated
+    if cache_path:
+        try:
+            save_cached_metadata(cache_path, result)
+        except Exception as exc:
+            logging.warning("Failed to write LLM cache entry %s: %s", cache_path, exc)
+    return result, total_words, estimated
+
+
+# Per-filing fields written to the checkpoint journal and folded back on resume
+CHECKPOINT_FIELDS = ("_doc_stats", "metadata", "_meta_source")
+
+
+def read_checkpoint_records(partial_path: str) -> List[Dict[str, Any]]:
+    """Read the JSONL checkpoint journal left by an interrupted run (if any)."""
+    records: List[Dict[str, Any]] = []
+    if not ensure_exists(partial_path):
+        return records
+    loads = orjson.loads if orjson is not None else json.loads
+    with open(partial_path, "rb") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                records.append(loads(line))
+            except ValueError:
+                # A crash can leave the last line half-written
+                logging.warning("Skipping truncated checkpoint line in %s", partial_path)
+    return records
+
+
+def open_checkpoint_journal(partial_path: str) -> Any:
+    """Open the journal for appending, terminating a torn last line first."""
+    needs_newline = False
+    if ensure_exists(partial_path) and os.path.getsize(partial_path) > 0:
+        with open(partial_path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            needs_newline = f.read(1) != b"\n"
+    journal = open(partial_path, "ab")
+    if needs_newline:
+        journal.write(b"\n")
+    return journal
+
+
+def append_checkpoint_record(journal: Any, filing: Dict[str, Any]) -> None:
+    record = {"uid": filing.get("uid")}
+    record.update({k: filing[k] for k in CHECKPOINT_FIELDS if k in filing})
+    journal.write(dumps_json_line(record))
+    journal.flush()
 
 
 def process_scope(
@@ -235,10 +437,16 @@ def process_scope(
     max_words: int,
     overwrite: bool,
     max_files: Optional[int] = None,
+    head_bytes: Optional[int] = None,
+    concurrency: int = 1,
+    cache_dir: Optional[str] = None,
+    chain_key: str = "",
 ) -> None:
     # Flat layout: filings at dataset/filings_<scope>.json and files in dataset/files/
     files_dir = os.path.join(dataset_dir, "files")
     filings_path = os.path.join(dataset_dir, f"filings_{scope_type}.json")
+    # One listing instead of up to two stat calls per filing
+    present = set(os.listdir(files_dir)) if os.path.isdir(files_dir) else set()
     filings: List[Dict[str, Any]] = []
     if ensure_exists(filings_path):
         filings = read_json_file(filings_path)
@@ -247,62 +455,99 @@ def process_scope(
             filings = []
     else:
         # Build from *.htm files if no filings.json exists
-        if os.path.isdir(files_dir):
-            for name in sorted(os.listdir(files_dir)):
-                if name.lower().endswith((".htm", ".html")):
-                    uid = os.path.splitext(name)[0]
-                    filings.append({"uid": uid})
-
-    processed = 0
+        for name in sorted(present):
+            if name.lower().endswith((".htm", ".html")):
+                uid = os.path.splitext(name)[0]
+                filings.append({"uid": uid})
+
+    # Fold back what an interrupted run checkpointed. Only filings that got metadata
+    # are done; stats-only records (short docs, LLM failures) are retried, as a
+    # normal rerun would
+    partial_path = f"{filings_path}.partial.jsonl"
+    by_uid = {str(f.get("uid")): f for f in reversed(filings) if f.get("uid")}
+    resumed = set()
+    for record in read_checkpoint_records(partial_path):
+        filing = by_uid.get(str(record.get("uid")))
+        if filing is not None:
+            filing.update({k: record[k] for k in CHECKPOINT_FIELDS if k in record})
+            if isinstance(record.get("metadata"), dict):
+                resumed.add(str(record.get("uid")))
+    if resumed:
+        logging.info("Resumed %s checkpointed filings from %s", len(resumed), partial_path)
+
+    todo: List[tuple[Dict[str, Any], str]] = []
     for filing in filings:
         uid = str(filing.get("uid")) if filing.get("uid") else None
-        if not uid:
+        if not uid or uid in resumed:
             continue
         # Skip if already has metadata and not overwriting
         if not overwrite and isinstance(filing.get("metadata"), dict):
             continue
-        html_path = os.path.join(files_dir, f"{uid}.htm")
-        if not ensure_exists(html_path):
-            # try .html
+        if f"{uid}.htm" in present:
+            html_path = os.path.join(files_dir, f"{uid}.htm")
+        elif f"{uid}.html" in present:
             html_path = os.path.join(files_dir, f"{uid}.html")
-        if not ensure_exists(html_path):
+        else:
             logging.debug("HTML not found for uid=%s in %s", uid, files_dir)
             continue
+        todo.append((filing, html_path))
 
-        meta, total_words = extract_metadata_html(chain, html_path, max_words=max_words)
-        # Always record stats
-        filing.setdefault("_doc_stats", {})
-        if total_words is not None:
-            filing["_doc_stats"]["doc_word_count"] = int(total_words)
-            filing["_doc_stats"]["doc_pages_estimate"] = float(total_words) / 500.0
-        # If short doc, don't call LLM (already skipped inside extractor)
-        if meta is None:
-            # persist stats even when skipping LLM
-            write_json_file(filings_path, filings)
-            continue
-
-        # Persist back into object
-        filing["metadata"] = meta.dict()
-        filing.setdefault("_meta_source", {})
-        filing["_meta_source"].update(
-            {
-                "model": getattr(chain, "model", None) or "openai",
-                "max_words": max_words,
-                "html_file": os.path.basename(html_path),
+    processed = 0
+    # HTML parsing and LLM calls run on worker threads; results are merged and
+    # checkpointed on this thread only, so filings is never mutated concurrently.
+    # Each finished filing is appended to the journal (O(1)) instead of rewriting
+    # the whole filings file; the journal is merged into it once at the end.
+    # With max_files, filings are submitted in file order in waves of at most the
+    # number still needed, so no LLM call is started whose result would be dropped.
+    remaining = iter(todo)
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor, open_checkpoint_journal(
+        partial_path
+    ) as journal:
+        while True:
+            batch = list(itertools.islice(remaining, max_files - processed)) if max_files else list(remaining)
+            if not batch:
+                break
+            futures = {
+                executor.submit(
+                    extract_metadata_html, chain, html_path, max_words, head_bytes, cache_dir, chain_key
+                ): (filing, html_path)
+                for filing, html_path in batch
             }
-        )
-        processed += 1
-
-        # Periodically flush to disk to avoid losing work
-        if processed % 5 == 0:
-            write_json_file(filings_path, filings)
-            logging.info("Checkpoint saved %s (processed=%s)", filings_path, processed)
-
-        if max_files and processed >= max_files:
-            break
-
-    # Final save
+            for future in as_completed(futures):
+                filing, html_path = futures[future]
+                meta, total_words, estimated = future.result()
+                # Always record stats
+                filing.setdefault("_doc_stats", {})
+                if total_words is not None:
+                    filing["_doc_stats"]["doc_word_count"] = int(total_words)
+                    filing["_doc_stats"]["doc_pages_estimate"] = float(total_words) / 500.0
+                    # Only present when the count was extrapolated from a --head-bytes prefix
+                    if estimated:
+                        filing["_doc_stats"]["doc_word_count_estimated"] = True
+                    else:
+                        filing["_doc_stats"].pop("doc_word_count_estimated", None)
+                # If short doc, don't call LLM (already skipped inside extractor)
+                if meta is None:
+                    # persist stats even when skipping LLM
+                    append_checkpoint_record(journal, filing)
+                    continue
+
+                # Persist back into object
+                filing["metadata"] = meta.model_dump(mode="json")
+                filing.setdefault("_meta_source", {})
+                filing["_meta_source"].update(
+                    {
+                        "model": getattr(chain, "model", None) or "openai",
+                        "max_words": max_words,
+                        "html_file": os.path.basename(html_path),
+                    }
+                )
+                processed += 1
+                append_checkpoint_record(journal, filing)
+
+    # Final save; the journal is only dropped once its content is in filings_path
     write_json_file(filings_path, filings)
+    os.remove(partial_path)
     logging.info(
         "Wrote metadata for %s entries to %s", processed, filings_path
     )
@@ -335,6 +580,16 @@ def parse_args() -> argparse.Namespace:
         default=900,
         help="Max words from first page/snippet to include in the prompt (500-1000 recommended)",
     )
+    parser.add_argument(
+        "--head-bytes",
+        type=int,
+        default=0,
+        help=(
+            "Parse only this many leading bytes of large HTML files (e.g. 262144); their word "
+            "count is then extrapolated and flagged as doc_word_count_estimated. "
+            "Default 0 parses whole files for exact counts"
+        ),
+    )
     parser.add_argument(
         "--overwrite",
         action="store_true",
@@ -346,6 +601,25 @@ def parse_args() -> argparse.Namespace:
         default=None,
         help="Optional limit of files to process per scope (useful for testing)",
     )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=8,
+        help="Number of files parsed and sent to the LLM in parallel",
+    )
+    parser.add_argument(
+        "--llm-cache-dir",
+        default=None,
+        help=(
+            "Directory caching LLM results per (model, temperature, prompt, schema, snippet) "
+            "(default: <dataset-dir>/llm_cache)"
+        ),
+    )
+    parser.add_argument(
+        "--no-llm-cache",
+        action="store_true",
+        help="Always call the LLM, ignoring and not writing cached results",
+    )
     parser.add_argument(
         "--log-level",
         default="INFO",
@@ -360,6 +634,11 @@ def main() -> None:
     load_env()
 
     chain = build_chain(args.model, args.temperature)
+    chain_key = chain_cache_key(args.model, args.temperature)
+    cache_dir = None
+    if not args.no_llm_cache:
+        cache_dir = args.llm_cache_dir or os.path.join(args.dataset_dir, "llm_cache")
+        os.makedirs(cache_dir, exist_ok=True)
 
     scopes = load_scopes(args.scope_file)
     for scope in scopes:
@@ -372,6 +651,10 @@ def main() -> None:
             max_words=args.max_words,
             overwrite=args.overwrite,
             max_files=args.max_files,
+            head_bytes=args.head_bytes,
+            concurrency=args.concurrency,
+            cache_dir=cache_dir,
+            chain_key=chain_key,
         )
 
 
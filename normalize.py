@@ -18,6 +18,8 @@ Output:
 - For kept entries, updates `metadata.contract_type` to normalized value and also adds
   `metadata.contract_type_normalized` with the same value for clarity. Adds `scope` field if not present.
 - Removes `metadata.contract_category` in the output (no longer used downstream).
+- Writes `<output>.cache_key` with the signatures of the inputs and of this script; a rerun
+  over unchanged inputs and code is skipped unless --force is given.
 """
 
 from __future__ import annotations
@@ -26,7 +28,17 @@ import argparse
 import json
 import logging
 import os
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+try:
+    import orjson
+except ImportError:  # optional speedup; stdlib json is used otherwise
+    orjson = None
+
+try:
+    import ijson
+except ImportError:  # optional; filings files are then loaded whole
+    ijson = None
 
 
 def configure_logging(level: str) -> None:
@@ -39,13 +51,84 @@ def configure_logging(level: str) -> None:
 
 
 def read_json(path: str) -> Any:
+    if orjson is not None:
+        with open(path, "rb") as f:
+            return orjson.loads(f.read())
     with open(path, "r", encoding="utf-8") as f:
         return json.load(f)
 
 
+def dumps_json(data: Any) -> bytes:
+    """Serialize `data` as indented UTF-8 JSON."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+        except orjson.JSONEncodeError:
+            # e.g. integers beyond 64 bits, which only the stdlib encoder handles
+            pass
+    return json.dumps(data, indent=2, ensure_ascii=False).encode("utf-8")
+
+
 def write_json(path: str, data: Any) -> None:
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+    # Serialize to one buffer and write it in a single call; json.dump would issue
+    # a small write per token
+    payload = dumps_json(data)
+    with open(path, "wb") as f:
+        f.write(payload)
+
+
+def dump_json_item(item: Any) -> bytes:
+    """Serialize one array item exactly as `write_json` lays it out inside the list."""
+    # JSON strings cannot contain a raw newline, so every newline is layout
+    return dumps_json(item).replace(b"\n", b"\n  ")
+
+
+class JSONArrayError(ValueError):
+    """Raised by `iter_json_items` when a file cannot be read as a JSON array."""
+
+
+def iter_json_items(path: str) -> Iterator[Any]:
+    """Yield the items of a top-level JSON array.
+
+    With ijson installed the file is parsed incrementally, so a large scope file is
+    never held in memory as a whole. ijson's C backend rejects integers that do not
+    fit in 64 bits; such a file is re-read with the stdlib parser (which keeps them
+    exact) and iteration resumes after the items already yielded. Any failure to read
+    the file as an array (missing, malformed, truncated or not a list) raises
+    JSONArrayError; errors raised by the caller while iterating pass through unchanged.
+    """
+    yielded = 0
+    try:
+        if ijson is not None:
+            with open(path, "rb") as f:
+                head = f.read(64).lstrip()
+                if not head.startswith(b"["):
+                    raise JSONArrayError("top-level value is not a list")
+                f.seek(0)
+                try:
+                    for item in ijson.items(f, "item", use_float=True):
+                        yield item
+                        yielded += 1
+                    return
+                except ijson.JSONError as exc:
+                    logging.debug("Incremental parse of %s failed (%s); re-reading it whole", path, exc)
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        else:
+            data = read_json(path)
+        if not isinstance(data, list):
+            raise JSONArrayError("top-level value is not a list")
+    except JSONArrayError:
+        raise
+    except Exception as exc:
+        raise JSONArrayError(str(exc)) from exc
+    yield from data[yielded:]
+
+
+# Sidecar next to the output recording the inputs it was built from
+CACHE_KEY_SUFFIX = ".cache_key"
+# Bump when the output format changes in a way the code signature below would not catch
+CACHE_FORMAT_VERSION = 1
 
 
 def detect_mapping_file(mapping_file_arg: Optional[str]) -> str:
@@ -57,8 +140,51 @@ def detect_mapping_file(mapping_file_arg: Optional[str]) -> str:
     return "normalize.json"
 
 
-def normalize_contract_type(
-    mapping: Dict[str, Dict[str, Optional[str]]],
+# Lowercased type -> (value of the first case-insensitive match, section it came from)
+SectionIndex = Dict[str, Tuple[Optional[str], Dict[str, Optional[str]]]]
+
+_MISSING = object()
+
+
+def build_section_index(sections: List[Dict[str, Optional[str]]]) -> SectionIndex:
+    """Index the keys of `sections` by lowercase; the first section/key to match wins."""
+    index: SectionIndex = {}
+    for section in sections:
+        for k, v in section.items():
+            lower = k.lower()
+            if lower not in index:
+                index[lower] = (v, section)
+    return index
+
+
+def build_lookup(mapping: Dict[str, Dict[str, Optional[str]]]) -> Dict[str, Any]:
+    """Precompute the case-insensitive indexes used by `lookup_contract_type`.
+
+    - sections: one index per mapping section (by section name)
+    - other: index of the 'other' section (used for an unknown category)
+    - fallback: the 'other' section then every other section in mapping order, merged
+      into one index so the whole fallback search is a single lookup
+    """
+    other = mapping.get("other", {})
+    non_other = [section for name, section in mapping.items() if name != "other"]
+    return {
+        "sections": {name: build_section_index([section]) for name, section in mapping.items()},
+        "other": build_section_index([other]),
+        "fallback": build_section_index([other] + non_other),
+    }
+
+
+def _find_in_index(index: SectionIndex, type_value: str, lower_value: str) -> Any:
+    hit = index.get(lower_value)
+    if hit is None:
+        return _MISSING
+    value, section = hit
+    # An exact key in the matching section takes precedence over a case-insensitive one
+    return section[type_value] if type_value in section else value
+
+
+def lookup_contract_type(
+    lookup: Dict[str, Any],
     contract_category: Optional[str],
     contract_type: Optional[str],
 ) -> Optional[str]:
@@ -69,49 +195,47 @@ def normalize_contract_type(
     type_value = str(contract_type).strip()
     lower_value = type_value.lower()
 
-    # If a category is provided, attempt within that section first
+    # Category section first (unknown category -> 'other'), then 'other', then any section.
+    # The first section with a match decides, even when its value is null.
     category_key = str(contract_category).strip().lower() if contract_category else None
     if category_key:
-        section = mapping.get(category_key) or mapping.get("other", {})
-        # 1) Direct exact match
-        if type_value in section:
-            return section[type_value]
-        # 2) Case-insensitive match
-        for k, v in section.items():
-            if k.lower() == lower_value:
-                return v
-        # 3) Try explicit 'other' section if not already used
-        if category_key != "other" and "other" in mapping:
-            other_section = mapping["other"]
-            if type_value in other_section:
-                return other_section[type_value]
-            for k, v in other_section.items():
-                if k.lower() == lower_value:
-                    return v
-
-    # If no category or not found above, search 'other' then any section
-    if "other" in mapping:
-        other_section2 = mapping["other"]
-        if type_value in other_section2:
-            return other_section2[type_value]
-        for k, v in other_section2.items():
-            if k.lower() == lower_value:
-                return v
-
-    # Cross-section search as a last resort
-    for section_name, section in mapping.items():
-        if section_name == "other":
-            continue
-        if type_value in section:
-            return section[type_value]
-        for k, v in section.items():
-            if k.lower() == lower_value:
-                return v
+        section_index = lookup["sections"].get(category_key) or lookup["other"]
+        found = _find_in_index(section_index, type_value, lower_value)
+        if found is not _MISSING:
+            return found
+    found = _find_in_index(lookup["fallback"], type_value, lower_value)
+    return None if found is _MISSING else found
 
-    return None
+
+def normalize_contract_type(
+    mapping: Dict[str, Dict[str, Optional[str]]],
+    contract_category: Optional[str],
+    contract_type: Optional[str],
+) -> Optional[str]:
+    return lookup_contract_type(build_lookup(mapping), contract_category, contract_type)
 
 
-def process(dataset_dir: str, mapping_file: Optional[str], output_path: Optional[str]) -> None:
+def file_signature(path: str) -> List[Any]:
+    """Identify a file's current contents by path, modification time and size."""
+    st = os.stat(path)
+    return [os.path.abspath(path), st.st_mtime_ns, st.st_size]
+
+
+def output_is_current(out_path: str, cache_key: List[Any]) -> bool:
+    """Return True if `out_path` was written by a run over exactly the inputs in `cache_key`."""
+    try:
+        saved = read_json(out_path + CACHE_KEY_SUFFIX)
+        return saved == {"inputs": cache_key, "output": file_signature(out_path)}
+    except Exception:
+        return False
+
+
+def process(
+    dataset_dir: str,
+    mapping_file: Optional[str],
+    output_path: Optional[str],
+    force: bool = False,
+) -> None:
     mapping_path = detect_mapping_file(mapping_file)
     if not os.path.exists(mapping_path):
         raise FileNotFoundError(f"Mapping file not found: {mapping_path}")
@@ -119,51 +243,73 @@ def process(dataset_dir: str, mapping_file: Optional[str], output_path: Optional
     if not isinstance(mapping, dict):
         raise ValueError("Mapping file must contain a JSON object: { 'category': { 'type': 'normalized' } }")
 
-    combined: List[Dict[str, Any]] = []
+    # Case-insensitive indexes are built once instead of rescanning sections per record
+    lookup = build_lookup(mapping)
 
     if not os.path.isdir(dataset_dir):
         raise FileNotFoundError(f"Dataset directory not found: {dataset_dir}")
 
-    for name in sorted(os.listdir(dataset_dir)):
-        if not (name.startswith("filings_") and name.endswith(".json")):
-            continue
-        scope = name[len("filings_") : -len(".json")]
-        filings_path = os.path.join(dataset_dir, name)
-        try:
-            filings = read_json(filings_path)
-        except Exception as exc:
-            logging.warning("Failed to read %s: %s", filings_path, exc)
-            continue
-        if not isinstance(filings, list):
-            logging.warning("%s is not a list; skipping", filings_path)
-            continue
-
-        kept_count = 0
-        for record in filings:
-            meta = record.get("metadata") if isinstance(record, dict) else None
-            if not isinstance(meta, dict):
-                continue
-            cat = meta.get("contract_category")
-            typ = meta.get("contract_type")
-            normalized = normalize_contract_type(mapping, cat, typ)
-            if normalized is None:
-                continue
-            # Update record for output
-            record = dict(record)
-            meta_out = dict(meta)
-            meta_out["contract_type_normalized"] = normalized
-            meta_out["contract_type"] = normalized
-            # Drop contract_category from output metadata (no longer used)
-            meta_out.pop("contract_category", None)
-            record["metadata"] = meta_out
-            record.setdefault("scope", scope)
-            combined.append(record)
-            kept_count += 1
-        logging.info("%s: kept %s/%s after normalization", scope, kept_count, len(filings))
+    # DirEntry carries the file type from the listing, so no extra stat per name
+    with os.scandir(dataset_dir) as it:
+        entries = sorted(
+            (e for e in it if e.name.startswith("filings_") and e.name.endswith(".json") and e.is_file()),
+            key=lambda e: e.name,
+        )
 
+    # Kept records are written out scope by scope, so only one scope's records are held
+    # in memory; the output only replaces out_path once it is complete
     out_path = output_path or os.path.join(dataset_dir, "filings.json")
-    write_json(out_path, combined)
-    logging.info("Wrote %s normalized filings to %s", len(combined), out_path)
+    # Skip the run when neither the mapping, any scope file nor this script changed since the last one
+    cache_key = [CACHE_FORMAT_VERSION, file_signature(__file__), file_signature(mapping_path)]
+    cache_key += [file_signature(e.path) for e in entries]
+    if not force and output_is_current(out_path, cache_key):
+        logging.info("%s is up to date; skipping (use --force to rebuild)", out_path)
+        return
+    tmp_path = out_path + ".tmp"
+    total = 0
+    try:
+        with open(tmp_path, "wb") as out:
+            out.write(b"[")
+            for entry in entries:
+                scope = entry.name[len("filings_") : -len(".json")]
+                filings_path = entry.path
+                # Records of a scope are only added once its file has been read completely
+                scope_records: List[Dict[str, Any]] = []
+                seen_count = 0
+                try:
+                    for record in iter_json_items(filings_path):
+                        seen_count += 1
+                        meta = record.get("metadata") if isinstance(record, dict) else None
+                        if not isinstance(meta, dict):
+                            continue
+                        cat = meta.get("contract_category")
+                        typ = meta.get("contract_type")
+                        normalized = lookup_contract_type(lookup, cat, typ)
+                        if normalized is None:
+                            continue
+                        # Update record for output; records are freshly parsed and not reused,
+                        # so they are modified in place rather than copied
+                        meta["contract_type_normalized"] = normalized
+                        meta["contract_type"] = normalized
+                        # Drop contract_category from output metadata (no longer used)
+                        meta.pop("contract_category", None)
+                        record.setdefault("scope", scope)
+                        scope_records.append(record)
+                except JSONArrayError as exc:
+                    logging.warning("Failed to read %s: %s; skipping", filings_path, exc)
+                    continue
+                for record in scope_records:
+                    out.write(b",\n  " if total else b"\n  ")
+                    out.write(dump_json_item(record))
+                    total += 1
+                logging.info("%s: kept %s/%s after normalization", scope, len(scope_records), seen_count)
+            out.write(b"\n]" if total else b"]")
+        os.replace(tmp_path, out_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    write_json(out_path + CACHE_KEY_SUFFIX, {"inputs": cache_key, "output": file_signature(out_path)})
+    logging.info("Wrote %s normalized filings to %s", total, out_path)
 
 
 def parse_args() -> argparse.Namespace:
@@ -175,6 +321,7 @@ def parse_args() -> argparse.Namespace:
         help="Mapping file path (defaults to mapping.json if exists, else normalize.json)",
     )
     p.add_argument("--output", default=None, help="Output file path (default: dataset/filings.json)")
+    p.add_argument("--force", action="store_true", help="Rebuild the output even if its inputs are unchanged")
     p.add_argument("--log-level", default="INFO", help="Logging level")
     return p.parse_args()
 
@@ -182,7 +329,12 @@ def parse_args() -> argparse.Namespace:
 def main() -> None:
     args = parse_args()
     configure_logging(args.log_level)
-    process(dataset_dir=args.dataset_dir, mapping_file=args.mapping_file, output_path=args.output)
+    process(
+        dataset_dir=args.dataset_dir,
+        mapping_file=args.mapping_file,
+        output_path=args.output,
+        force=args.force,
+    )
 
 
 if __name__ == "__main__":
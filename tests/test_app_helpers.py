@@ -1,4 +1,23 @@
-from app import list_scopes_flat, flatten_filing
+import json
+import os
+
+import pandas as pd
+
+from app import (
+    chart_counts,
+    dataset_signature,
+    filter_rows,
+    flatten_filing,
+    flatten_filings,
+    list_scopes_flat,
+    load_json_rows,
+    optimize_dtypes,
+    parquet_is_fresh,
+    publish_static_html,
+    read_parquet_rows,
+    viewer_options,
+    write_parquet_rows,
+)
 
 
 def test_list_scopes_flat_handles_missing_dir(tmp_path):
@@ -46,3 +65,151 @@ def test_flatten_filing_builds_expected_fields(tmp_path):
     assert str(uid) in str(row["html_path"])  # path chosen
 
 
+def test_parquet_cache_roundtrip_and_freshness(tmp_path):
+    d = tmp_path / "dataset"
+    d.mkdir()
+    filings = [
+        {
+            "uid": "u1",
+            "formType": "8-K",
+            "metadata": {"contract_type": "ISDA", "is_amendment": True, "party_1": {"name": "A"}},
+            "_doc_stats": {"doc_pages_estimate": 2.5},
+        }
+    ]
+    (d / "filings_A.json").write_text(json.dumps(filings))
+    (d / "filings_B.json").write_text(json.dumps([{"uid": "u2", "metadata": {"contract_type": "GMRA"}}]))
+    parquet_path = str(d / "filings.parquet")
+    signature = dataset_signature(str(d))
+    assert parquet_is_fresh(parquet_path, signature) is False
+
+    rows = load_json_rows(str(d))
+    write_parquet_rows(rows, parquet_path, signature)
+    assert parquet_is_fresh(parquet_path, signature) is True
+    df = read_parquet_rows(parquet_path)
+    # Same frame as the JSON path, including the non-display scope column
+    pd.testing.assert_frame_equal(optimize_dtypes(df), optimize_dtypes(load_json_rows(str(d))))
+    assert df["scope"].tolist() == ["A", "B"]
+    assert df.loc[0, "contract_type"] == "ISDA"
+    assert bool(df.loc[0, "is_amendment"]) is True
+
+    # A modified source invalidates the cache
+    (d / "filings_A.json").write_text(json.dumps(filings * 2))
+    assert parquet_is_fresh(parquet_path, dataset_signature(str(d))) is False
+
+    # So does a deleted source, even though every remaining one is older than the cache
+    signature = dataset_signature(str(d))
+    write_parquet_rows(load_json_rows(str(d)), parquet_path, signature)
+    assert parquet_is_fresh(parquet_path, signature) is True
+    os.remove(d / "filings_B.json")
+    assert parquet_is_fresh(parquet_path, dataset_signature(str(d))) is False
+
+    # Removing filings.json falls back to the older per-scope files: also a miss
+    (d / "filings.json").write_text(json.dumps(filings))
+    signature = dataset_signature(str(d))
+    write_parquet_rows(load_json_rows(str(d)), parquet_path, signature)
+    assert parquet_is_fresh(parquet_path, signature) is True
+    os.remove(d / "filings.json")
+    assert parquet_is_fresh(parquet_path, dataset_signature(str(d))) is False
+
+
+def test_flatten_filings_matches_flatten_filing(tmp_path):
+    files_dir = tmp_path / "files"
+    files_dir.mkdir()
+    (files_dir / "a.htm").write_text("<html></html>")
+    (files_dir / "b.html").write_text("<html></html>")
+    filings = [
+        {
+            "uid": "a",
+            "formType": "8-K",
+            "metadata": {"contract_type": "ISDA", "is_amendment": False, "party_2": {"name": "B"}},
+            "_doc_stats": {"doc_pages_estimate": 1.7},
+        },
+        {"uid": "b", "metadata": {"contract_type": "", "confidence": 0.5}, "_doc_stats": {"doc_pages_estimate": 4}},
+        {"uid": "c", "metadata": None, "_doc_stats": {"doc_pages_estimate": 0.2}},
+    ]
+    df = flatten_filings(["S"] * len(filings), filings, str(tmp_path))
+    expected = [flatten_filing("S", f, str(tmp_path)) for f in filings]
+    pd.testing.assert_frame_equal(df, pd.DataFrame(expected))
+
+
+def test_dataset_signature_changes_with_sources(tmp_path):
+    d = tmp_path / "dataset"
+    d.mkdir()
+    assert dataset_signature(str(d)) == ()
+    src = d / "filings_A.json"
+    src.write_text("[]")
+    before = dataset_signature(str(d))
+    assert [name for name, _, _ in before] == ["filings_A.json"]
+    src.write_text("[{}]")
+    assert dataset_signature(str(d)) != before
+
+
+def test_filter_rows_combines_filters():
+    df = pd.DataFrame(
+        {
+            "contract_type": ["ISDA", "GMRA", "ISDA", "CSA"],
+            "is_amendment": [True, False, False, None],
+        }
+    )
+    assert filter_rows(df, [], "All") is df
+    assert filter_rows(df, ["ISDA"], "All").index.tolist() == [0, 2]
+    assert filter_rows(df, ["ISDA", "GMRA"], False).index.tolist() == [1, 2]
+    assert filter_rows(df, [], True).index.tolist() == [0]
+
+
+def test_optimize_dtypes_and_filter_with_missing_amendment():
+    df = optimize_dtypes(
+        pd.DataFrame({"contract_type": ["ISDA", "GMRA", "ISDA"], "is_amendment": [True, None, False]})
+    )
+    assert df["contract_type"].cat.categories.tolist() == ["GMRA", "ISDA"]
+    assert str(df["is_amendment"].dtype) == "boolean"
+    assert filter_rows(df, ["ISDA"], False).index.tolist() == [2]
+    assert filter_rows(df, [], True).index.tolist() == [0]
+
+
+def test_viewer_options_labels_and_dedup():
+    df = optimize_dtypes(
+        pd.DataFrame(
+            {
+                "uid": ["a", "b", "a", "c"],
+                "contract_type": ["ISDA", "GMRA", "CSA", "ISDA"],
+                "is_amendment": [True, False, False, None],
+            }
+        )
+    )
+    assert viewer_options(df) == [
+        {"uid": "a", "label": "a / ISDA / True"},
+        {"uid": "b", "label": "b / GMRA / False"},
+        {"uid": "c", "label": "c / ISDA / Unknown"},
+    ]
+    assert viewer_options(df.iloc[:0]) == []
+
+
+def test_publish_static_html_links_and_refreshes(tmp_path):
+    src = tmp_path / "x.htm"
+    src.write_text("<p>one</p>")
+    static_dir = tmp_path / "static" / "files"
+
+    assert publish_static_html(str(src), str(static_dir)) == "x.htm"
+    assert (static_dir / "x.htm").read_text() == "<p>one</p>"
+
+    src.unlink()
+    src.write_text("<p>two, longer</p>")
+    publish_static_html(str(src), str(static_dir))
+    assert (static_dir / "x.htm").read_text() == "<p>two, longer</p>"
+
+
+def test_chart_counts_matches_groupby():
+    df = optimize_dtypes(
+        pd.DataFrame(
+            {
+                "contract_type": ["a", "b", None, "a", "a", "b"],
+                "is_amendment": [True, False, False, None, False, False],
+            }
+        )
+    )
+    grouped, order = chart_counts(df)
+    counts = {(r.contract_type, r.is_amendment): r.count for r in grouped.itertuples()}
+    assert counts == {("a", True): 1, ("a", False): 1, ("b", False): 2, ("Unknown", False): 1}
+    assert order[0] in ("a", "b") and order[-1] == "Unknown"
+    assert chart_counts(df.iloc[:0])[0].empty
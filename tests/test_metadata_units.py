@@ -1,3 +1,6 @@
+import json
+import os
+
 import pytest
 
 
@@ -5,7 +8,7 @@ def test_html_text_stats_and_normalize_whitespace():
     try:
         from metadata import html_text_stats, normalize_whitespace
     except Exception:
-        pytest.skip("LangChain/bs4 may not be installed in minimal env")
+        pytest.skip("LangChain/lxml may not be installed in minimal env")
 
     html = """
     <html>
@@ -21,11 +24,48 @@ def test_html_text_stats_and_normalize_whitespace():
     assert normalize_whitespace(" a\n b \t ") == "a b"
 
 
+# (html, max_words, expected) as produced by the original BeautifulSoup extraction
+HTML_TEXT_CASES = [
+    ("<html><body>x</body></html><p>y</p>", 50, ("x y", 2)),
+    ("<html><body>a</body></html><html><body>b &amp; c</body></html> tail", 50, ("a b & c tail", 5)),
+    ("<p>one<!-- hidden -->two<script>var x</script>three<noscript>no <b>js</b></noscript></p>", 2, ("one two", 3)),
+    ("<p>Ab cd<!DOCTYPE html>&amp;</p><table><tr><td>t1</td><td>t2</td></tr></table>", 50, ("Ab cd & t1 t2", 5)),
+    ("<title>Exhibit 10.1</title><p>caf\u00e9&nbsp;terms</p>", 50, ("Exhibit 10.1 caf\u00e9 terms", 4)),
+    ("   ", 5, ("", 0)),
+]
+
+
+@pytest.mark.parametrize("html,max_words,expected", HTML_TEXT_CASES)
+def test_html_text_stats_matches_beautifulsoup_output(html, max_words, expected):
+    try:
+        from metadata import html_text_stats, html_to_text_first_words
+    except Exception:
+        pytest.skip("LangChain/lxml may not be installed in minimal env")
+
+    assert html_text_stats(html, max_words=max_words) == expected
+    assert html_to_text_first_words(html, max_words=max_words) == expected[0]
+
+
+@pytest.mark.parametrize("html,max_words,expected", HTML_TEXT_CASES)
+def test_html_text_stats_equivalent_to_beautifulsoup(html, max_words, expected):
+    bs4 = pytest.importorskip("bs4")
+    try:
+        from metadata import html_text_stats
+    except Exception:
+        pytest.skip("LangChain/lxml may not be installed in minimal env")
+
+    soup = bs4.BeautifulSoup(html, "lxml")
+    for tag in soup(["script", "style", "noscript"]):
+        tag.decompose()
+    words = soup.get_text(separator=" ").split()
+    assert html_text_stats(html, max_words=max_words) == (" ".join(words[:max_words]), len(words))
+
+
 def test_ensure_exists(tmp_path):
     try:
         from metadata import ensure_exists
     except Exception:
-        pytest.skip("LangChain/bs4 may not be installed in minimal env")
+        pytest.skip("LangChain/lxml may not be installed in minimal env")
 
     p = tmp_path / "x.txt"
     p.write_text("hi")
@@ -33,3 +73,252 @@ def test_ensure_exists(tmp_path):
     assert ensure_exists(str(tmp_path / "missing.txt")) is False
 
 
+def _write_scope(tmp_path, uids, words=600):
+    files_dir = tmp_path / "files"
+    files_dir.mkdir()
+    for uid in uids:
+        (files_dir / f"{uid}.htm").write_text("<p>" + "word " * words + "</p>")
+    (tmp_path / "filings_T.json").write_text(json.dumps([{"uid": uid} for uid in uids]))
+
+
+def _fake_chain(calls):
+    from metadata import ContractMetadata, Party
+
+    party = Party(name="A")
+    result = ContractMetadata(
+        document_type="contract",
+        contract_category="master",
+        is_amendment=False,
+        party_1=party,
+        party_2=party,
+        explanation="x",
+        confidence=0.5,
+    )
+
+    class Chain:
+        def invoke(self, inputs):
+            calls.append(inputs["snippet"])
+            return result
+
+    return Chain()
+
+
+class _Crash(BaseException):
+    """Stands in for a kill mid-run; not an Exception, so the extractor does not swallow it."""
+
+
+def test_process_scope_resumes_checkpoint_journal(tmp_path):
+    try:
+        from metadata import process_scope
+    except Exception:
+        pytest.skip("LangChain/lxml may not be installed in minimal env")
+
+    _write_scope(tmp_path, ["a", "b", "c", "d"])
+    journal = tmp_path / "filings_T.json.partial.jsonl"
+
+    # First run dies on the second LLM call; the first filing is already journaled
+    calls = []
+    chain = _fake_chain(calls)
+    real_invoke = chain.invoke
+
+    def crashing_invoke(inputs):
+        if calls:
+            raise _Crash()
+        return real_invoke(inputs)
+
+    chain.invoke = crashing_invoke
+    with pytest.raises(_Crash):
+        process_scope(str(tmp_path), "T", chain, max_words=900, overwrite=True)
+    lines = journal.read_bytes().splitlines()
+    assert [json.loads(line)["uid"] for line in lines] == ["a"]
+    assert "metadata" not in json.loads((tmp_path / "filings_T.json").read_text())[0]
+
+    # The crash also tore a record in half while it was being written
+    with open(journal, "ab") as f:
+        f.write(b'{"uid": "b", "metadata": {"contr')
+
+    calls = []
+    process_scope(str(tmp_path), "T", _fake_chain(calls), max_words=900, overwrite=True)
+
+    out = {f["uid"]: f for f in json.loads((tmp_path / "filings_T.json").read_text())}
+    # "a" is folded back from the journal; the torn "b" and the rest are extracted again
+    assert len(calls) == 3
+    assert all(f["metadata"]["document_type"] == "contract" for f in out.values())
+    assert out["a"]["_doc_stats"]["doc_word_count"] == 600
+    assert out["a"]["_meta_source"]["html_file"] == "a.htm"
+    # The journal is dropped once its content is in the final file
+    assert not journal.exists()
+
+
+def test_process_scope_retries_journaled_failures_on_resume(tmp_path):
+    try:
+        from metadata import process_scope
+    except Exception:
+        pytest.skip("LangChain/lxml may not be installed in minimal env")
+
+    _write_scope(tmp_path, ["a", "b"])
+    journal = tmp_path / "filings_T.json.partial.jsonl"
+    # "a" failed at the LLM before the crash (stats only); "b" completed
+    journal.write_text(
+        json.dumps({"uid": "a", "_doc_stats": {"doc_word_count": 600}})
+        + "\n"
+        + json.dumps({"uid": "b", "metadata": {"contract_type": "resumed"}})
+        + "\n"
+    )
+
+    calls = []
+    process_scope(str(tmp_path), "T", _fake_chain(calls), max_words=900, overwrite=True)
+
+    out = {f["uid"]: f for f in json.loads((tmp_path / "filings_T.json").read_text())}
+    assert len(calls) == 1
+    assert out["a"]["metadata"]["document_type"] == "contract"
+    assert out["b"]["metadata"] == {"contract_type": "resumed"}
+
+
+def test_process_scope_max_files_starts_no_extra_llm_calls(tmp_path):
+    try:
+        from metadata import process_scope
+    except Exception:
+        pytest.skip("LangChain/lxml may not be installed in minimal env")
+
+    _write_scope(tmp_path, ["short", "a", "b", "c", "d", "e"])
+    # Under 500 words: skipped without an LLM call, so it does not count towards max_files
+    (tmp_path / "files" / "short.htm").write_text("<p>" + "word " * 10 + "</p>")
+
+    calls = []
+    process_scope(str(tmp_path), "T", _fake_chain(calls), max_words=900, overwrite=True, max_files=1, concurrency=4)
+    assert len(calls) == 1
+    out = json.loads((tmp_path / "filings_T.json").read_text())
+    assert [f["uid"] for f in out if "metadata" in f] == ["a"]
+
+    calls = []
+    process_scope(str(tmp_path), "T", _fake_chain(calls), max_words=900, overwrite=True, max_files=3, concurrency=4)
+    assert len(calls) == 3
+    out = json.loads((tmp_path / "filings_T.json").read_text())
+    assert [f["uid"] for f in out if "metadata" in f] == ["a", "b", "c"]
+
+
+def test_llm_cache_entry_roundtrip_and_keying(tmp_path):
+    try:
+        from metadata import (
+            ContractMetadata,
+            Party,
+            chain_cache_key,
+            llm_cache_path,
+            load_cached_metadata,
+            save_cached_metadata,
+        )
+    except Exception:
+        pytest.skip("LangChain/lxml may not be installed in minimal env")
+
+    key = chain_cache_key("gpt-x", 0.0)
+    path = llm_cache_path(str(tmp_path), key, "snippet")
+    # Keyed on the chain and the exact snippet
+    assert path == llm_cache_path(str(tmp_path), chain_cache_key("gpt-x", 0.0), "snippet")
+    assert path != llm_cache_path(str(tmp_path), key, "snippet ")
+    assert path != llm_cache_path(str(tmp_path), chain_cache_key("gpt-y", 0.0), "snippet")
+
+    # Miss, then a hit after saving; no temporary file is left behind
+    assert load_cached_metadata(path) is None
+    meta = ContractMetadata(
+        document_type="contract",
+        contract_category="master",
+        is_amendment=False,
+        party_1=Party(name="A"),
+        party_2=Party(name="B"),
+        explanation="x",
+        confidence=0.7,
+    )
+    save_cached_metadata(path, meta)
+    assert load_cached_metadata(path) == meta
+    assert [p.name for p in tmp_path.iterdir()] == [os.path.basename(path)]
+
+    # A corrupt or schema-invalid entry reads as a miss
+    with open(path, "w") as f:
+        f.write('{"document_type": "contract", "confid')
+    assert load_cached_metadata(path) is None
+    with open(path, "w") as f:
+        f.write(json.dumps({"document_type": "contract"}))
+    assert load_cached_metadata(path) is None
+
+
+def test_process_scope_llm_cache_hit_miss_and_unreadable(tmp_path):
+    try:
+        from metadata import chain_cache_key, process_scope
+    except Exception:
+        pytest.skip("LangChain/lxml may not be installed in minimal env")
+
+    _write_scope(tmp_path, ["a", "b"])
+    (tmp_path / "files" / "b.htm").write_text("<p>" + "other " * 600 + "</p>")
+    cache_dir = tmp_path / "llm_cache"
+    cache_dir.mkdir()
+    key = chain_cache_key("gpt-x", 0.0)
+
+    def run(chain_key):
+        calls = []
+        process_scope(
+            str(tmp_path),
+            "T",
+            _fake_chain(calls),
+            max_words=900,
+            overwrite=True,
+            cache_dir=str(cache_dir),
+            chain_key=chain_key,
+        )
+        return len(calls)
+
+    # Miss: both documents go to the LLM and are cached
+    assert run(key) == 2
+    entries = sorted(cache_dir.iterdir())
+    assert len(entries) == 2
+    # Hit: nothing is sent again
+    assert run(key) == 0
+    # A different model/temperature/prompt/schema key misses
+    assert chain_cache_key("gpt-x", 0.5) != key
+    assert run(chain_cache_key("gpt-x", 0.5)) == 2
+    # An unreadable entry is ignored and rewritten
+    entries[0].write_text("{not json")
+    assert run(key) == 1
+    assert run(key) == 0
+
+
+def test_read_snippet_and_word_count_prefix_and_full_paths(tmp_path):
+    try:
+        from metadata import read_snippet_and_word_count
+    except Exception:
+        pytest.skip("LangChain/lxml may not be installed in minimal env")
+
+    dense = tmp_path / "dense.htm"
+    dense.write_text("<p>" + "word " * 4000 + "</p>")
+    # No prefix: exact count
+    assert read_snippet_and_word_count(str(dense), max_words=10) == (" ".join(["word"] * 10), 4000, False)
+    # Dense prefix: count extrapolated from the first 2000 bytes and flagged
+    snippet, total, estimated = read_snippet_and_word_count(str(dense), max_words=10, head_bytes=2000)
+    assert snippet == " ".join(["word"] * 10)
+    assert estimated is True
+    assert 3900 <= total <= 4100
+
+    # Sparse prefix (mostly markup): falls back to parsing the whole file, exact count
+    sparse = tmp_path / "sparse.htm"
+    sparse.write_text("<style>" + ".x{}" * 1000 + "</style><p>" + "word " * 50 + "</p>")
+    assert read_snippet_and_word_count(str(sparse), max_words=10, head_bytes=2000) == (
+        " ".join(["word"] * 10),
+        50,
+        False,
+    )
+
+
+def test_process_scope_flags_estimated_word_counts(tmp_path):
+    try:
+        from metadata import process_scope
+    except Exception:
+        pytest.skip("LangChain/lxml may not be installed in minimal env")
+
+    _write_scope(tmp_path, ["a"], words=3000)
+    process_scope(str(tmp_path), "T", _fake_chain([]), max_words=50, overwrite=True, head_bytes=2000)
+    stats = json.loads((tmp_path / "filings_T.json").read_text())[0]["_doc_stats"]
+    assert stats["doc_word_count_estimated"] is True
+
+    process_scope(str(tmp_path), "T", _fake_chain([]), max_words=50, overwrite=True)
+    stats = json.loads((tmp_path / "filings_T.json").read_text())[0]["_doc_stats"]
+    assert stats == {"doc_word_count": 3000, "doc_pages_estimate": 6.0}
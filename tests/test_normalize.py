@@ -2,7 +2,9 @@ import json
 import os
 from tempfile import TemporaryDirectory
 
-from normalize import normalize_contract_type, process
+import pytest
+
+from normalize import build_lookup, lookup_contract_type, normalize_contract_type, process, read_json, write_json
 
 
 def test_normalize_contract_type_with_category_exact():
@@ -68,3 +70,167 @@ def test_process_combines_and_filters_records(tmp_path):
     assert rec1["scope"] == "ISDA"
 
 
+def test_read_write_json_roundtrip_unicode():
+    data = [{"uid": "a", "metadata": {"party_1": {"name": "Société Générale"}}}]
+    with TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "out.json")
+        write_json(path, data)
+        assert read_json(path) == data
+        with open(path, "r", encoding="utf-8") as f:
+            assert "Société Générale" in f.read()
+
+
+def test_lookup_contract_type_precedence():
+    mapping = {
+        "master": {"Loan": None, "isda": "ISDA (ci)", "ISDA": "ISDA (exact)"},
+        "other": {"loan": "Loan Agreement"},
+        "misc": {"LOAN": "Misc Loan", "Note": "Promissory Note"},
+    }
+    lookup = build_lookup(mapping)
+    # A null value in the first matching section stops the search
+    assert lookup_contract_type(lookup, "master", "loan") is None
+    assert lookup_contract_type(lookup, None, "LOAN") == "Loan Agreement"
+    # Exact key beats an earlier case-insensitive one
+    assert lookup_contract_type(lookup, "master", "ISDA") == "ISDA (exact)"
+    assert lookup_contract_type(lookup, "master", "Isda") == "ISDA (ci)"
+    assert lookup_contract_type(lookup, "unknown", " note ") == "Promissory Note"
+    assert lookup_contract_type(lookup, "master", "") is None
+
+
+def test_process_skips_non_list_and_truncated_scope_files(tmp_path):
+    dataset_dir = tmp_path / "dataset"
+    dataset_dir.mkdir()
+    (dataset_dir / "filings_a.json").write_text(json.dumps({"not": "a list"}))
+    (dataset_dir / "filings_b.json").write_text('[{"metadata": {"contract_type": "ISDA"}}, {')
+    (dataset_dir / "filings_c.json").write_text(
+        json.dumps([{"uid": "c1", "metadata": {"contract_type": "isda", "confidence": 0.5}}])
+    )
+    mapping_path = tmp_path / "mapping.json"
+    mapping_path.write_text(json.dumps({"master": {"ISDA": "ISDA Master Agreement"}}))
+    out_path = tmp_path / "out.json"
+
+    process(dataset_dir=str(dataset_dir), mapping_file=str(mapping_path), output_path=str(out_path))
+
+    out = json.loads(out_path.read_text())
+    assert [r["uid"] for r in out] == ["c1"]
+    assert out[0]["metadata"]["confidence"] == 0.5
+
+
+def test_process_keeps_integers_beyond_64_bits(tmp_path):
+    dataset_dir = tmp_path / "dataset"
+    dataset_dir.mkdir()
+    big = 123456789012345678901234567890
+    # ijson's C backend stops at the big integer, after the first record was yielded
+    (dataset_dir / "filings_a.json").write_text(
+        "["
+        '{"uid": "a1", "metadata": {"contract_type": "ISDA"}}, '
+        f'{{"uid": "a2", "cik": {big}, "metadata": {{"contract_type": "ISDA"}}}}'
+        "]"
+    )
+    mapping_path = tmp_path / "mapping.json"
+    mapping_path.write_text(json.dumps({"master": {"ISDA": "ISDA Master Agreement"}}))
+    out_path = tmp_path / "out.json"
+
+    process(dataset_dir=str(dataset_dir), mapping_file=str(mapping_path), output_path=str(out_path))
+
+    out = json.loads(out_path.read_text())
+    assert [r["uid"] for r in out] == ["a1", "a2"]
+    assert out[1]["cik"] == big
+
+
+def test_iter_json_items_raises_only_its_own_error_for_unreadable_files(tmp_path):
+    from normalize import JSONArrayError, iter_json_items
+
+    path = tmp_path / "x.json"
+    for content in ('{"not": "a list"}', "[1, 2", ""):
+        path.write_text(content)
+        with pytest.raises(JSONArrayError):
+            list(iter_json_items(str(path)))
+    with pytest.raises(JSONArrayError):
+        list(iter_json_items(str(tmp_path / "missing.json")))
+    # Errors raised while consuming the items are not turned into read errors
+    path.write_text("[1, 2]")
+    with pytest.raises(TypeError):
+        for item in iter_json_items(str(path)):
+            item["metadata"]
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_process_streamed_output_matches_write_json(tmp_path, monkeypatch, use_orjson):
+    import normalize
+
+    if not use_orjson:
+        monkeypatch.setattr(normalize, "orjson", None)
+    dataset_dir = tmp_path / "dataset"
+    dataset_dir.mkdir()
+    (dataset_dir / "filings_A.json").write_text(
+        json.dumps(
+            [
+                {
+                    "uid": "1",
+                    "metadata": {"contract_category": "master", "contract_type": "ISDA", "n": [1, {"x": "a\nb"}]},
+                },
+                {"uid": "2", "metadata": {"contract_type": "none"}},
+            ]
+        )
+    )
+    (dataset_dir / "filings_B.json").write_text(json.dumps([{"uid": "3", "metadata": {"contract_type": "isda"}}]))
+    (dataset_dir / "filings_C.json").write_text(json.dumps([]))
+    mapping_path = tmp_path / "normalize.json"
+    mapping_path.write_text(json.dumps({"master": {"ISDA": "ISDA Master Agreement"}}))
+
+    out_path = tmp_path / "out.json"
+    process(dataset_dir=str(dataset_dir), mapping_file=str(mapping_path), output_path=str(out_path))
+    expected_path = tmp_path / "expected.json"
+    write_json(str(expected_path), read_json(str(out_path)))
+    assert out_path.read_bytes() == expected_path.read_bytes()
+    assert [r["uid"] for r in read_json(str(out_path))] == ["1", "3"]
+    assert not (tmp_path / "out.json.tmp").exists()
+
+    # No kept records: an empty list, laid out like write_json([])
+    (dataset_dir / "filings_A.json").write_text(json.dumps([]))
+    (dataset_dir / "filings_B.json").write_text(json.dumps([]))
+    process(dataset_dir=str(dataset_dir), mapping_file=str(mapping_path), output_path=str(out_path))
+    write_json(str(expected_path), [])
+    assert out_path.read_bytes() == expected_path.read_bytes()
+
+
+def test_process_skips_rebuild_when_inputs_unchanged(tmp_path, monkeypatch):
+    import normalize
+
+    dataset_dir = tmp_path / "dataset"
+    dataset_dir.mkdir()
+    (dataset_dir / "filings_A.json").write_text(json.dumps([{"uid": "1", "metadata": {"contract_type": "ISDA"}}]))
+    mapping_path = tmp_path / "normalize.json"
+    mapping_path.write_text(json.dumps({"master": {"ISDA": "ISDA Master Agreement"}}))
+    out_path = tmp_path / "out.json"
+
+    reads = []
+    real_iter = normalize.iter_json_items
+    monkeypatch.setattr(normalize, "iter_json_items", lambda path: reads.append(path) or real_iter(path))
+
+    def run(force=False):
+        reads.clear()
+        process(dataset_dir=str(dataset_dir), mapping_file=str(mapping_path), output_path=str(out_path), force=force)
+        return len(reads)
+
+    assert run() == 1
+    assert (tmp_path / "out.json.cache_key").exists()
+    # Unchanged inputs: nothing is read
+    assert run() == 0
+    assert run(force=True) == 1
+    # A changed mapping, a new scope file or an edited output triggers a rebuild
+    mapping_path.write_text(json.dumps({"master": {"ISDA": "ISDA"}}))
+    assert run() == 1
+    assert run() == 0
+    (dataset_dir / "filings_B.json").write_text(json.dumps([]))
+    assert run() == 2
+    out_path.write_text("[]")
+    assert run() == 2
+    # So does a new version of the normalization code or of its output format
+    monkeypatch.setattr(normalize, "__file__", str(mapping_path))
+    assert run() == 2
+    assert run() == 0
+    monkeypatch.setattr(normalize, "CACHE_FORMAT_VERSION", normalize.CACHE_FORMAT_VERSION + 1)
+    assert run() == 2
+    assert [r["metadata"]["contract_type"] for r in read_json(str(out_path))] == ["ISDA"]
@@ -1,21 +1,7 @@
-import sys
-import types
+import os
 import importlib
 import pytest
 
-# Provide a minimal stub for sec_api to allow importing search.py without the package
-if "sec_api" not in sys.modules:
-    sec_api_stub = types.ModuleType("sec_api")
-    class FullTextSearchApi:  # noqa: D401 - simple stub
-        """Stub"""
-        pass
-    class RenderApi:  # noqa: D401 - simple stub
-        """Stub"""
-        pass
-    sec_api_stub.FullTextSearchApi = FullTextSearchApi
-    sec_api_stub.RenderApi = RenderApi
-    sys.modules["sec_api"] = sec_api_stub
-
 search = importlib.import_module("search")
 html_contains_keywords = search.html_contains_keywords
 normalize_query = search.normalize_query
@@ -51,3 +37,201 @@ def test_normalize_query():
     assert normalize_query(None) == ""
 
 
+def test_download_and_filter_filings_keeps_order_and_filters(tmp_path):
+    class Renderer:
+        def get_filing(self, url):
+            if "bad" in url:
+                raise RuntimeError("boom")
+            return f"<body>{'ISDA master' if 'keep' in url else 'other'} {url}</body>"
+
+    filings = [
+        {"filingUrl": f"https://x/{name}.htm", "accessionNo": str(i)}
+        for i, name in enumerate(["keep1", "drop", "bad", "keep2", "keep3"])
+    ]
+    filings.append({"filingUrl": "https://x/no-accession.htm"})
+    selected = search.download_and_filter_filings(
+        Renderer(), str(tmp_path), "T", filings, ["isda"], delay_ms=0, concurrency=3
+    )
+    assert [r["filingUrl"].rsplit("/", 1)[1] for r in selected] == ["keep1.htm", "keep2.htm", "keep3.htm"]
+    assert sorted(os.listdir(tmp_path / "files")) == sorted(f"{r['uid']}.htm" for r in selected)
+
+    # A second run finds every saved filing in the directory listing and downloads nothing
+    class NoDownload:
+        def get_filing(self, url):
+            raise AssertionError("unexpected download of " + url)
+
+    kept = [f for f in filings if "keep" in f["filingUrl"]]
+    again = search.download_and_filter_filings(NoDownload(), str(tmp_path), "T", kept, ["isda"], delay_ms=0)
+    assert [r["uid"] for r in again] == [r["uid"] for r in selected]
+
+
+def test_html_contains_keywords_ignores_script_text():
+    html = "<head><script>var isda = 'ISDA';</script></head><body>Loan agreement</body>"
+    assert html_contains_keywords(html, ["loan"]) is True
+    assert html_contains_keywords(html, ["isda"]) is False
+
+
+def test_clean_html_head_drops_constructs_cut_at_slice_end():
+    clean_html_head = search.clean_html_head
+    assert clean_html_head("Terms &amp; conditions &nbs", complete=False) == "terms & conditions"
+    assert clean_html_head("Master <div class=", complete=False) == "master"
+    assert clean_html_head("Master <style>.isda{", complete=False) == "master"
+    # The same input taken as a whole document keeps its trailing text
+    assert clean_html_head("Master <style>.isda{", complete=True) == "master .isda{"
+    # Unicode whitespace (as matched by \s) collapses to single spaces
+    assert clean_html_head("\u00a0 ISDA\u2003\x1c\n Master\u3000", complete=True) == "isda master"
+
+
+@pytest.mark.parametrize(
+    "html",
+    [
+        "<p>a</p><style>.x{}</style>b<SCRIPT type=x>if (a<b) {}</Script>c",
+        "<script>never closed <style>s</style> tail",
+        "<script>" * 50 + "</style>",
+        "<styles>kept</styles><style>x</STYLE ><style>y</STYLE>",
+        "<script>a</script >b</script>",
+    ],
+)
+def test_remove_script_style_matches_regex(html):
+    assert search.remove_script_style(html) == search.SCRIPT_STYLE_RE.sub(" ", html)
+
+
+def test_html_contains_keywords_grows_slice_past_markup(monkeypatch):
+    monkeypatch.setattr(search, "KEYWORD_SCAN_CHARS", 64)
+    # The first slices are all markup; the text only appears after several doublings
+    html = "<div class='x'></div>" * 40 + "<p>ISDA Master Agreement</p>" + "filler " * 200
+    assert html_contains_keywords(html, ["isda", "master"]) is True
+    assert html_contains_keywords("<b></b>" * 100 + "short text", ["text"]) is True
+
+
+class FakeResponse:
+    def __init__(self, status_code, body=b"", chunk_size=1000):
+        self.status_code = status_code
+        self.encoding = "utf-8"
+        self.body = body
+        self.chunk_size = chunk_size
+        self.chunks_read = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def iter_content(self, size):
+        for i in range(0, len(self.body), self.chunk_size):
+            self.chunks_read += 1
+            yield self.body[i : i + self.chunk_size]
+
+
+class FakeSession:
+    def __init__(self, response):
+        self.response = response
+        self.calls = []
+
+    def get(self, url, **kwargs):
+        self.calls.append((url, kwargs))
+        if isinstance(self.response, Exception):
+            raise self.response
+        return self.response
+
+
+class FakeRenderer:
+    api_endpoint = "https://mirror.example"
+    api_key = "SECRET"
+    proxies = {}
+
+
+FILING_URL = "https://www.sec.gov/Archives/edgar/data/123/000/ex10.htm"
+
+
+def test_stream_filing_if_matching_saves_whole_filing(tmp_path):
+    body = ("<p>ISDA Master Agreement caf\u00e9 " + "clause " * 3000 + "</p>").encode("utf-8")
+    session = FakeSession(FakeResponse(200, body, chunk_size=777))
+    out_path = str(tmp_path / "x.htm")
+    assert search.stream_filing_if_matching(session, FakeRenderer(), FILING_URL, out_path, ["isda"]) is True
+    with open(out_path, encoding="utf-8") as f:
+        assert f.read() == body.decode("utf-8")
+    assert session.calls[0][0] == "https://mirror.example/123/000/ex10.htm"
+    assert session.calls[0][1]["params"] == {"token": "SECRET"}
+    assert os.listdir(tmp_path) == ["x.htm"]
+
+
+def test_stream_filing_if_matching_stops_reading_on_miss(tmp_path):
+    response = FakeResponse(200, ("<p>" + "clause " * 20000 + "</p>").encode("utf-8"), chunk_size=1000)
+    out_path = str(tmp_path / "x.htm")
+    saved = search.stream_filing_if_matching(FakeSession(response), FakeRenderer(), FILING_URL, out_path, ["isda"])
+    assert saved is False
+    assert response.chunks_read == 1
+    assert os.listdir(tmp_path) == []
+    # A short filing is decided once the stream ends
+    short = FakeResponse(200, b"<p>ISDA schedule</p>")
+    assert search.stream_filing_if_matching(FakeSession(short), FakeRenderer(), FILING_URL, out_path, ["isda"]) is True
+
+
+def test_download_and_filter_filings_prepares_needles_once(tmp_path, monkeypatch):
+    prepared = []
+    real_needles = search.keyword_needles
+    monkeypatch.setattr(search, "keyword_needles", lambda kws: prepared.append(kws) or real_needles(kws))
+
+    class Session:
+        def get(self, url, **kwargs):
+            text = "ISDA master" if "keep" in url else "other"
+            return FakeResponse(200, f"<p>{text} {url}</p>".encode("utf-8"))
+
+    filings = [
+        {"filingUrl": f"https://x/{name}.htm", "accessionNo": str(i)}
+        for i, name in enumerate(["keep1", "drop", "keep2"])
+    ]
+    selected = search.download_and_filter_filings(
+        FakeRenderer(), str(tmp_path), "T", filings, ["ISDA", "Master"], delay_ms=0, concurrency=2, session=Session()
+    )
+    assert [r["filingUrl"].rsplit("/", 1)[1] for r in selected] == ["keep1.htm", "keep2.htm"]
+    assert prepared == [["ISDA", "Master"]]
+
+
+def test_stream_filing_if_matching_cleans_markup_prefix_in_linear_time(tmp_path, monkeypatch):
+    cleans = []
+    real_clean = search.cleaned_text_head
+    monkeypatch.setattr(search, "cleaned_text_head", lambda *a, **kw: cleans.append(1) or real_clean(*a, **kw))
+
+    # 300 chunks of markup before any text; no charset in the response headers
+    body = ("<div class='x'></div>" * 5000 + "<p>ISDA Master " + "clause " * 200 + "</p>").encode("utf-8")
+    response = FakeResponse(200, body, chunk_size=len(body) // 300)
+    response.encoding = None
+    out_path = str(tmp_path / "x.htm")
+    assert search.stream_filing_if_matching(FakeSession(response), FakeRenderer(), FILING_URL, out_path, ["isda"])
+    assert response.chunks_read > 300
+    # One clean per doubling of the received text, not one per chunk
+    assert len(cleans) <= 12
+    with open(out_path, "rb") as f:
+        assert f.read() == body
+
+
+def test_stream_filing_if_matching_hides_token(tmp_path):
+    out_path = str(tmp_path / "x.htm")
+    for response in (FakeResponse(403), search.requests.ConnectionError("https://mirror.example/x?token=SECRET")):
+        with pytest.raises(RuntimeError) as excinfo:
+            search.stream_filing_if_matching(FakeSession(response), FakeRenderer(), FILING_URL, out_path, [])
+        assert "SECRET" not in str(excinfo.value)
+
+
+def test_keyword_needles_lowercases_and_dedupes():
+    assert search.keyword_needles(["ISDA", "", "isda", "Master"]) == ["isda", "master"]
+
+
+def test_filing_uid_is_stable_per_exhibit():
+    uid = search.filing_uid("0001-24-000001", "https://x/ex10-1.htm")
+    assert uid == search.filing_uid("0001-24-000001", "https://x/ex10-1.htm")
+    assert uid != search.filing_uid("0001-24-000001", "https://x/ex10-2.htm")
+    assert len(uid) == 32
+
+
+def test_stream_filing_if_matching_transcodes_non_utf8(tmp_path):
+    body = ("<p>ISDA Société Générale " + "clause " * 200 + "</p>").encode("latin-1")
+    response = FakeResponse(200, body, chunk_size=50)
+    response.encoding = "ISO-8859-1"
+    out_path = str(tmp_path / "x.htm")
+    assert search.stream_filing_if_matching(FakeSession(response), FakeRenderer(), FILING_URL, out_path, ["isda"])
+    with open(out_path, "rb") as f:
+        assert f.read() == body.decode("latin-1").encode("utf-8")